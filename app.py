@@ -6,6 +6,7 @@ from utils.io import get_processed_data
 # Import section rendering modules
 from sections import intro, overview, deep_dives, conclusions
 import re # Needed for splitting line names
+from utils.geo import query_radius, query_nearest
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
@@ -26,6 +27,7 @@ st.caption("""
 # --- DATA LOADING (Uses cached function) ---
 processed_data = get_processed_data()
 df_geo = processed_data.get('geo_table', pd.DataFrame())
+station_index = processed_data.get('station_index')
 
 # --- SIDEBAR CONTROLS (Filters) ---
 with st.sidebar:
@@ -42,6 +44,35 @@ with st.sidebar:
         if df_geo.empty: st.warning("Data not loaded.")
         else: st.warning("Column 'line_name_list' not found.")
 
+    # --- Location Search (uses the spatial index, no table scan) ---
+    selected_location = None
+    if station_index is not None:
+        st.markdown("---")
+        st.subheader("Stations Near a Location")
+        if st.checkbox("Search near a location"):
+            loc_lat = st.number_input("Latitude", value=48.8584, min_value=48.0, max_value=49.5, format="%.4f")
+            loc_lon = st.number_input("Longitude", value=2.3470, min_value=1.4, max_value=3.6, format="%.4f")
+            radius_m = st.slider("Search radius (m)", min_value=100, max_value=3000, value=500, step=100)
+            selected_location = (loc_lat, loc_lon, radius_m)
+
+            near_labels, near_distances = query_radius(station_index, loc_lat, loc_lon, radius_m)
+            if len(near_labels) == 0:
+                # Nothing in the radius: fall back to the closest stations
+                st.caption(f"No station within {radius_m} m, showing the 5 nearest.")
+                near_labels, near_distances = query_nearest(station_index, loc_lat, loc_lon, k=5)
+            df_near = df_geo.loc[near_labels, ['station_name', 'line_name_list', 'pollution_score']].copy()
+            df_near['distance_m'] = near_distances.round().astype(int)
+
+            if not df_near.empty:
+                cleanest = df_near.sort_values(by=['pollution_score', 'distance_m']).iloc[0]
+                st.success(f"Cleanest nearby: **{cleanest['station_name']}** (score {cleanest['pollution_score']:.1f}, {cleanest['distance_m']} m)")
+                st.dataframe(df_near.rename(columns={
+                    'station_name': 'Station', 'line_name_list': 'Lines',
+                    'pollution_score': 'Score', 'distance_m': 'Distance (m)'
+                }), hide_index=True)
+            else:
+                st.warning("No station coordinates available.")
+
     st.markdown("---")
     st.subheader("Analysis Metrics")
     selected_metric = st.selectbox( # Primarily for display context, not used for filtering visuals
@@ -76,7 +107,7 @@ if not df_geo.empty:
     st.markdown("---")
     overview.render(df_geo_filtered, selected_metric)
     st.markdown("---")
-    deep_dives.render(filtered_data, selected_line)
+    deep_dives.render(filtered_data, selected_line, station_index, selected_location)
     st.markdown("---")
 
     # --- DATA QUALITY AND CONCLUSION ---
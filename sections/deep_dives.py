@@ -22,7 +22,7 @@ def style_pollution_level(level):
     return f'background-color: {background_color}; color: {color}'
 
 # --- Main Render Function ---
-def render(filtered_data, selected_line):
+def render(filtered_data, selected_line, station_index=None, location=None):
     # Retrieve data tables
     df_geo = filtered_data.get('geo_table', pd.DataFrame())
     df_single_line_agg = filtered_data.get('single_line_agg_table', pd.DataFrame())
@@ -33,7 +33,7 @@ def render(filtered_data, selected_line):
     st.subheader("2.1. Where are the Pollution Hotspots?")
     st.markdown("Map showing station locations. **Color** indicates pollution score (Red=High), **Size** indicates average traffic frequency. Hover for details.")
     if not df_geo.empty:
-        create_map_chart(df_geo)
+        create_map_chart(df_geo, station_index, location)
         # ANALYSIS TEXT FOR MAP:
         st.caption("Looking at the map, higher pollution stations (orange/red) don't seem tightly clustered in one area. Also, notice how station traffic (circle size) doesn't visually align perfectly with pollution level (color).")
     else:
@@ -0,0 +1,107 @@
+# tests/test_geo.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.geo import build_spatial_index, haversine_m, query_nearest, query_radius, query_viewport
+
+# --- Helpers ---
+def make_stations(n, seed=0):
+    """Random stations over Île-de-France, with shuffled non-contiguous integer labels."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'lat': 48.5 + rng.random(n) * 0.8,
+        'lon': 1.8 + rng.random(n) * 1.2,
+    }, index=rng.permutation(n) * 3 + 7)
+
+def brute_force_distances(df, lat, lon):
+    return pd.Series(haversine_m(lat, lon, df['lat'].to_numpy(), df['lon'].to_numpy()), index=df.index)
+
+def query_points(n, seed=1):
+    rng = np.random.default_rng(seed)
+    return list(zip(48.5 + rng.random(n) * 0.8, 1.8 + rng.random(n) * 1.2))
+
+# --- Tests ---
+@pytest.mark.parametrize("n", [1, 2, 50, 2000])
+@pytest.mark.parametrize("radius_m", [100, 500, 5000])
+def test_query_radius_matches_brute_force(n, radius_m):
+    df = make_stations(n)
+    index = build_spatial_index(df)
+    for lat, lon in query_points(20):
+        labels, distances = query_radius(index, lat, lon, radius_m)
+        expected = brute_force_distances(df, lat, lon)
+        expected = expected[expected <= radius_m]
+
+        assert set(labels) == set(expected.index)
+        assert np.all(np.diff(distances) >= 0)
+        np.testing.assert_allclose(distances, expected.loc[labels].to_numpy())
+
+@pytest.mark.parametrize("n", [1, 2, 50, 2000])
+@pytest.mark.parametrize("k", [1, 5])
+def test_query_nearest_matches_brute_force(n, k):
+    df = make_stations(n)
+    index = build_spatial_index(df)
+    for lat, lon in query_points(20):
+        labels, distances = query_nearest(index, lat, lon, k)
+        expected = brute_force_distances(df, lat, lon).sort_values()
+
+        assert len(labels) == min(k, n)
+        np.testing.assert_allclose(distances, expected.to_numpy()[:min(k, n)])
+        np.testing.assert_allclose(brute_force_distances(df, lat, lon).loc[labels].to_numpy(), distances)
+
+def test_query_nearest_far_outside_grid():
+    df = make_stations(200)
+    index = build_spatial_index(df)
+    labels, distances = query_nearest(index, 40.4, -3.7, k=3) # Madrid, ~1000 km away
+
+    expected = brute_force_distances(df, 40.4, -3.7).sort_values()
+    assert list(labels) == list(expected.index[:3])
+    np.testing.assert_allclose(distances, expected.to_numpy()[:3])
+
+def test_query_nearest_k_larger_than_station_count():
+    df = make_stations(4)
+    index = build_spatial_index(df)
+    labels, distances = query_nearest(index, 48.85, 2.35, k=10)
+
+    assert sorted(labels) == sorted(df.index)
+    assert np.all(np.diff(distances) >= 0)
+
+@pytest.mark.parametrize("n", [1, 2, 50, 2000])
+def test_query_viewport_matches_bbox_scan(n):
+    df = make_stations(n)
+    index = build_spatial_index(df)
+    for lat, lon in query_points(20):
+        for half_size in (0.005, 0.05, 2):
+            box = (lat - half_size, lat + half_size, lon - half_size, lon + half_size)
+            labels = query_viewport(index, *box)
+            inside = df['lat'].between(box[0], box[1]) & df['lon'].between(box[2], box[3])
+
+            assert sorted(labels) == sorted(df.index[inside])
+
+def test_labels_round_trip_non_range_index():
+    df = make_stations(30)
+    df.index = [f'station_{i}' for i in range(30)]
+    index = build_spatial_index(df)
+    labels, _ = query_radius(index, 48.9, 2.4, 100000)
+
+    assert sorted(labels) == sorted(df.index)
+    pd.testing.assert_frame_equal(df.loc[labels].sort_index(), df.sort_index())
+
+def test_nan_coordinates_are_skipped():
+    df = make_stations(10)
+    df.loc[df.index[:3], 'lat'] = np.nan
+    index = build_spatial_index(df)
+    labels, _ = query_nearest(index, 48.9, 2.4, k=10)
+
+    assert sorted(labels) == sorted(df.index[3:])
+
+@pytest.mark.parametrize("df", [
+    pd.DataFrame({'lat': [], 'lon': []}),
+    pd.DataFrame({'lat': [np.nan, np.nan], 'lon': [2.3, np.nan]}),
+], ids=['empty', 'all_nan'])
+def test_empty_index(df):
+    index = build_spatial_index(df)
+
+    assert len(query_radius(index, 48.85, 2.35, 1000)[0]) == 0
+    assert len(query_nearest(index, 48.85, 2.35, k=5)[0]) == 0
+    assert len(query_viewport(index, 48, 49, 2, 3)) == 0
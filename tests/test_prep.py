@@ -0,0 +1,111 @@
+# tests/test_prep.py
+import pandas as pd
+import pytest
+
+from utils.prep import GTFS_STATE_VERSION, is_valid_gtfs_state, process_gtfs
+
+# --- Synthetic Feeds ---
+def make_feed():
+    """Small GTFS feed: 4 routes, 2 trips each, 3 stops per trip."""
+    routes = pd.DataFrame({
+        'route_id': ['r0', 'r1', 'r2', 'r3'],
+        'route_short_name': ['1', '2', None, '1'], # r0 and r3 share a line name
+        'route_long_name': ['Line 1', 'Line 2', 'RER A', 'Line 1 bis'],
+    })
+    trips = pd.DataFrame({
+        'route_id': ['r0', 'r0', 'r1', 'r1', 'r2', 'r2', 'r3', 'r3'],
+        'trip_id': ['t0', 't1', 't2', 't3', 't4', 't5', 't6', 't7'],
+    })
+    stop_times = pd.DataFrame([
+        (trip_id, f's{(i + k) % 5}', f'{6 + i:02d}:{10 * k:02d}:00')
+        for i, trip_id in enumerate(trips['trip_id'])
+        for k in range(3)
+    ], columns=['trip_id', 'stop_id', 'arrival_time'])
+    stops = pd.DataFrame({
+        'stop_id': [f's{i}' for i in range(5)],
+        'stop_name': ['Châtelet', 'Gare de Lyon', 'Nation', 'Bastille', 'Châtelet'],
+        'stop_lat': [48.858, 48.844, 48.848, 48.853, 48.859],
+        'stop_lon': [2.347, 2.374, 2.396, 2.369, 2.348],
+    })
+    return {'stops': stops, 'stop_times': stop_times, 'trips': trips, 'routes': routes}
+
+def add_route(feed):
+    feed['routes'] = pd.concat([feed['routes'], pd.DataFrame({
+        'route_id': ['r4'], 'route_short_name': ['14'], 'route_long_name': ['Line 14'],
+    })], ignore_index=True)
+    feed['trips'] = pd.concat([feed['trips'], pd.DataFrame({'route_id': ['r4'], 'trip_id': ['t8']})], ignore_index=True)
+    feed['stop_times'] = pd.concat([feed['stop_times'], pd.DataFrame({
+        'trip_id': ['t8', 't8'], 'stop_id': ['s0', 's2'], 'arrival_time': ['08:00:00', '08:05:00'],
+    })], ignore_index=True)
+
+def remove_route(feed):
+    removed_trips = feed['trips'].loc[feed['trips']['route_id'] == 'r3', 'trip_id']
+    feed['routes'] = feed['routes'][feed['routes']['route_id'] != 'r3']
+    feed['trips'] = feed['trips'][feed['trips']['route_id'] != 'r3']
+    feed['stop_times'] = feed['stop_times'][~feed['stop_times']['trip_id'].isin(removed_trips)]
+
+def rename_route(feed):
+    feed['routes'].loc[feed['routes']['route_id'] == 'r1', 'route_short_name'] = '2bis'
+
+def move_trip(feed):
+    feed['trips'].loc[feed['trips']['trip_id'] == 't2', 'route_id'] = 'r2'
+
+def rename_trip(feed):
+    feed['trips'].loc[feed['trips']['trip_id'] == 't5', 'trip_id'] = 't5b'
+    feed['stop_times'].loc[feed['stop_times']['trip_id'] == 't5', 'trip_id'] = 't5b'
+
+def unparseable_arrival_time(feed):
+    feed['stop_times'].loc[feed['stop_times']['trip_id'] == 't3', 'arrival_time'] = 'not a time'
+
+def edit_stop_times_same_trip(feed):
+    feed['stop_times'] = pd.concat([feed['stop_times'], pd.DataFrame({
+        'trip_id': ['t1', 't1'], 'stop_id': ['s0', 's0'], 'arrival_time': ['07:20:00', '07:40:00'],
+    })], ignore_index=True)
+
+FEED_CHANGES = [add_route, remove_route, rename_route, move_trip, rename_trip, unparseable_arrival_time, edit_stop_times_same_trip]
+
+def make_feed_copy(feed):
+    return {name: df.copy() for name, df in feed.items()}
+
+def sorted_result(df):
+    return df.sort_values(by='station_name_clean').reset_index(drop=True)
+
+# --- Tests ---
+@pytest.mark.parametrize("changes", [[change] for change in FEED_CHANGES] + [FEED_CHANGES], ids=lambda changes: '+'.join(c.__name__ for c in changes))
+def test_incremental_gtfs_matches_full_rebuild(changes):
+    before = make_feed()
+    _, state = process_gtfs(before)
+
+    after = make_feed()
+    for change in changes:
+        change(after)
+    full_result, _ = process_gtfs(make_feed_copy(after))
+    incremental_result, _ = process_gtfs(make_feed_copy(after), state)
+
+    pd.testing.assert_frame_equal(sorted_result(incremental_result), sorted_result(full_result))
+
+def test_incremental_gtfs_without_changes_reuses_all_routes():
+    _, state = process_gtfs(make_feed())
+    full_result, _ = process_gtfs(make_feed())
+    incremental_result, new_state = process_gtfs(make_feed(), state)
+
+    pd.testing.assert_frame_equal(sorted_result(incremental_result), sorted_result(full_result))
+    pd.testing.assert_series_equal(new_state['route_fingerprints'], state['route_fingerprints'])
+
+def test_stop_times_edit_changes_result():
+    """Guards the stop_times case above against passing only because nothing changed."""
+    after = make_feed()
+    edit_stop_times_same_trip(after)
+    before_result, _ = process_gtfs(make_feed())
+    after_result, _ = process_gtfs(after)
+
+    assert not sorted_result(before_result).equals(sorted_result(after_result))
+
+def test_gtfs_state_validation():
+    _, state = process_gtfs(make_feed())
+    assert is_valid_gtfs_state(state)
+
+    assert not is_valid_gtfs_state(None)
+    assert not is_valid_gtfs_state({**state, 'version': GTFS_STATE_VERSION - 1})
+    assert not is_valid_gtfs_state({key: value for key, value in state.items() if key != 'route_partials'})
+    assert not is_valid_gtfs_state({**state, 'route_partials': state['route_partials'].drop(columns='hour')})
@@ -0,0 +1,117 @@
+# utils/geo.py
+import numpy as np
+
+# --- Configuration ---
+EARTH_RADIUS_M = 6371000
+METERS_PER_DEG_LAT = np.radians(1) * EARTH_RADIUS_M
+POINTS_PER_CELL = 4 # Target average station count per grid cell
+MIN_CELL_SIZE_M = 200
+
+# --- Utility Functions ---
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters (vectorized over numpy arrays)."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+def radius_bounds(lat, lon, radius_m):
+    """(lat_min, lat_max, lon_min, lon_max) of a box containing every point within `radius_m` of (lat, lon)."""
+    dlat = np.degrees(radius_m / EARTH_RADIUS_M)
+    max_abs_lat = min(abs(lat) + dlat, 89.9)
+    dlon = np.degrees(radius_m / (EARTH_RADIUS_M * np.cos(np.radians(max_abs_lat))))
+    return lat - dlat, lat + dlat, lon - dlon, lon + dlon
+
+def zoom_for_radius(lat, radius_m, size_px=500):
+    """Web-mercator zoom level at which a `radius_m` circle spans `size_px` pixels."""
+    meters_per_px = 2 * radius_m / size_px
+    return float(np.clip(np.log2(156543.03 * np.cos(np.radians(lat)) / meters_per_px), 0, 20))
+
+# --- Spatial Index ---
+def build_spatial_index(df_geo, lat_col='lat', lon_col='lon'):
+    """
+    Buckets stations into a uniform lat/lon grid sized to the data density.
+    Queries only look at the cells overlapping their search area, never at the full table.
+    Results are returned as labels of `df_geo`'s index.
+    """
+    coords = df_geo[[lat_col, lon_col]].astype(float).dropna()
+    lat, lon = coords[lat_col].to_numpy(), coords[lon_col].to_numpy()
+    labels = coords.index.to_numpy()
+
+    if len(lat) == 0:
+        return {"lat": lat, "lon": lon, "labels": labels}
+
+    # Size cells so each holds a few stations on average
+    lat_origin, lon_origin = lat.min(), lon.min()
+    lon_scale = METERS_PER_DEG_LAT * max(np.cos(np.radians(lat.mean())), 1e-6)
+    area_m2 = max((lat.max() - lat_origin) * METERS_PER_DEG_LAT, 1) * max((lon.max() - lon_origin) * lon_scale, 1)
+    cell_size_m = max(np.sqrt(area_m2 / len(lat) * POINTS_PER_CELL), MIN_CELL_SIZE_M)
+    cell_deg_lat, cell_deg_lon = cell_size_m / METERS_PER_DEG_LAT, cell_size_m / lon_scale
+
+    # Sort stations by cell so each cell is a contiguous slice
+    cell_rows = ((lat - lat_origin) // cell_deg_lat).astype(np.int64)
+    cell_cols = ((lon - lon_origin) // cell_deg_lon).astype(np.int64)
+    n_cols = int(cell_cols.max()) + 1
+    cell_keys = cell_rows * n_cols + cell_cols
+    order = np.argsort(cell_keys, kind='stable')
+    unique_keys, cell_starts, cell_counts = np.unique(cell_keys[order], return_index=True, return_counts=True)
+
+    return {
+        "lat": lat[order], "lon": lon[order], "labels": labels[order],
+        "lat_origin": lat_origin, "lon_origin": lon_origin,
+        "cell_deg_lat": cell_deg_lat, "cell_deg_lon": cell_deg_lon,
+        "n_rows": int(cell_rows.max()) + 1, "n_cols": n_cols,
+        "cell_keys": unique_keys, "cell_starts": cell_starts, "cell_ends": cell_starts + cell_counts,
+    }
+
+def _candidates_in_box(index, lat_min, lat_max, lon_min, lon_max):
+    """Positions (in the sorted index arrays) of stations in the grid cells overlapping a box."""
+    if len(index["lat"]) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Clip the box to the occupied grid so wide searches stay bounded
+    row_lo = max(int((lat_min - index["lat_origin"]) // index["cell_deg_lat"]), 0)
+    row_hi = min(int((lat_max - index["lat_origin"]) // index["cell_deg_lat"]), index["n_rows"] - 1)
+    col_lo = max(int((lon_min - index["lon_origin"]) // index["cell_deg_lon"]), 0)
+    col_hi = min(int((lon_max - index["lon_origin"]) // index["cell_deg_lon"]), index["n_cols"] - 1)
+    if row_lo > row_hi or col_lo > col_hi:
+        return np.empty(0, dtype=np.int64)
+
+    wanted = (np.arange(row_lo, row_hi + 1)[:, None] * index["n_cols"] + np.arange(col_lo, col_hi + 1)[None, :]).ravel()
+    pos = np.searchsorted(index["cell_keys"], wanted)
+    in_range = pos < len(index["cell_keys"])
+    pos, wanted = pos[in_range], wanted[in_range]
+    pos = pos[index["cell_keys"][pos] == wanted] # Keep occupied cells only
+    if len(pos) == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate([np.arange(s, e) for s, e in zip(index["cell_starts"][pos], index["cell_ends"][pos])])
+
+def query_radius(index, lat, lon, radius_m):
+    """Stations within `radius_m` meters of a point, as (labels, distances_m) sorted by distance."""
+    candidates = _candidates_in_box(index, *radius_bounds(lat, lon, radius_m))
+
+    distances = haversine_m(lat, lon, index["lat"][candidates], index["lon"][candidates])
+    in_radius = distances <= radius_m
+    candidates, distances = candidates[in_radius], distances[in_radius]
+    order = np.argsort(distances, kind='stable')
+    return index["labels"][candidates[order]], distances[order]
+
+def query_nearest(index, lat, lon, k=5):
+    """The `k` stations closest to a point, as (labels, distances_m) sorted by distance."""
+    k = min(k, len(index["lat"]))
+    if k == 0:
+        return index["labels"][:0], np.empty(0)
+
+    # Grow the search radius until it holds k stations
+    radius_m = max(index["cell_deg_lat"] * METERS_PER_DEG_LAT, 1)
+    while True:
+        labels, distances = query_radius(index, lat, lon, radius_m)
+        if len(labels) >= k:
+            return labels[:k], distances[:k]
+        radius_m *= 2
+
+def query_viewport(index, lat_min, lat_max, lon_min, lon_max):
+    """Labels of the stations inside a lat/lon bounding box (viewport culling)."""
+    candidates = _candidates_in_box(index, lat_min, lat_max, lon_min, lon_max)
+    lat, lon = index["lat"][candidates], index["lon"][candidates]
+    inside = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+    return index["labels"][candidates[inside]]
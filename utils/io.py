@@ -3,21 +3,52 @@ import streamlit as st
 import pandas as pd
 import requests
 import zipfile
+import os
+import pickle
 from io import BytesIO, StringIO
 
 # --- Configuration ---
 # Direct URLs for data download
 AIR_QUALITY_URL = "https://www.data.gouv.fr/api/1/datasets/r/efb9ab99-4c52-4722-be5a-245c5322ab33"
 GTFS_ZIP_URL = "https://www.data.gouv.fr/api/1/datasets/r/f9fff5b1-f9e4-4ec2-b8b3-8ad7005d869c"
+# Per-route GTFS aggregates kept between builds for incremental reprocessing
+GTFS_STATE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "gtfs_state.pkl")
 
 @st.cache_data(show_spinner="Downloading and preparing data...")
 def get_processed_data():
     """Main function: Downloads, caches, and processes the raw data."""
     air_df_raw, gtfs_data_raw = load_raw_data()
     from utils.prep import prepare_data
-    processed_tables = prepare_data(air_df_raw, gtfs_data_raw)
+    processed_tables = prepare_data(air_df_raw, gtfs_data_raw, load_gtfs_state())
+    # Persist the GTFS state but keep it out of the cached tables, which are unpickled on every rerun
+    gtfs_state = processed_tables.pop("gtfs_state", None)
+    if gtfs_state:
+        save_gtfs_state(gtfs_state)
     return processed_tables
 
+def load_gtfs_state():
+    """Loads the GTFS aggregates of the previous build, or None to force a full rebuild."""
+    from utils.prep import is_valid_gtfs_state
+    if not os.path.exists(GTFS_STATE_PATH):
+        return None
+    try:
+        with open(GTFS_STATE_PATH, "rb") as f:
+            gtfs_state = pickle.load(f)
+    except Exception as e:
+        st.warning(f"Ignoring unreadable GTFS cache, doing a full rebuild: {e}")
+        return None
+    # Stale or foreign state (older version, different shape): rebuild from scratch
+    return gtfs_state if is_valid_gtfs_state(gtfs_state) else None
+
+def save_gtfs_state(gtfs_state):
+    """Stores the GTFS aggregates so the next feed refresh only recomputes changed routes."""
+    try:
+        os.makedirs(os.path.dirname(GTFS_STATE_PATH), exist_ok=True)
+        with open(GTFS_STATE_PATH, "wb") as f:
+            pickle.dump(gtfs_state, f)
+    except Exception as e:
+        st.warning(f"Could not save GTFS cache: {e}")
+
 def load_raw_data():
     """Downloads and loads the raw datasets from their URLs."""
     
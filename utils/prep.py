@@ -3,12 +3,16 @@ import pandas as pd
 import numpy as np
 import unicodedata
 import re
+from utils.geo import build_spatial_index
 
 # --- Configuration ---
 POLLUTION_SCORE_MAP = {
     'pollution faible': 1, 'pollution moyenne': 2, 'pollution élevée': 3,
     'faible': 1, 'moyen': 2, 'élevée': 3,
 }
+# Bump whenever compute_route_partials' counting changes, so stored partials are rebuilt
+GTFS_STATE_VERSION = 1
+GTFS_STATE_KEYS = {'version', 'route_fingerprints', 'route_partials'}
 
 # --- Utility Functions ---
 def normalize_station_name(name):
@@ -34,15 +38,18 @@ def time_to_seconds(time_str):
         return np.nan
 
 # --- Main Preparation Function ---
-def prepare_data(air_df_raw, gtfs_data_raw):
-    """Orchestrates the cleaning, transformation, and merging of data."""
+def prepare_data(air_df_raw, gtfs_data_raw, gtfs_state=None):
+    """
+    Orchestrates the cleaning, transformation, and merging of data.
+    Pass the `gtfs_state` returned by a previous build to only reprocess changed GTFS routes.
+    """
     
     if air_df_raw.empty or not gtfs_data_raw or gtfs_data_raw['stops'].empty:
         # Return empty dict if raw data loading failed
         return {"geo_table": pd.DataFrame(), "line_ranking_table": pd.DataFrame(), "single_line_agg_table": pd.DataFrame()}
 
     df_air_processed = process_air_quality(air_df_raw)
-    df_gtfs_processed = process_gtfs(gtfs_data_raw)
+    df_gtfs_processed, new_gtfs_state = process_gtfs(gtfs_data_raw, gtfs_state)
 
     # Merge processed dataframes
     df_merged = pd.merge(
@@ -93,7 +100,9 @@ def prepare_data(air_df_raw, gtfs_data_raw):
     return {
         "geo_table": df_geo_table,
         "line_ranking_table": df_line_ranking_table, # Ranking by unique line combinations
-        "single_line_agg_table": df_single_line_agg # Ranking by individual lines
+        "single_line_agg_table": df_single_line_agg, # Ranking by individual lines
+        "gtfs_state": new_gtfs_state, # Per-route partial aggregates for the next incremental build
+        "station_index": build_spatial_index(df_geo_table) # Grid index over station coordinates
     }
 
 # --- Air Quality Processing ---
@@ -132,28 +141,41 @@ def process_air_quality(air_df_raw):
     return df_air_processed
 
 # --- GTFS Processing ---
-def process_gtfs(gtfs_data_raw):
-    """Processes GTFS data to calculate average frequency per station."""
+def process_gtfs(gtfs_data_raw, gtfs_state=None):
+    """
+    Processes GTFS data to calculate average frequency per station.
+
+    If `gtfs_state` from a previous build is given, only routes whose definition,
+    trips or stop times changed are recomputed; the other routes reuse their stored partial
+    aggregates. Returns the processed table and the new state to store.
+    """
     df_stops = gtfs_data_raw['stops']
     df_stop_times = gtfs_data_raw['stop_times']
     df_trips = gtfs_data_raw['trips']
     df_routes = gtfs_data_raw['routes']
 
-    # Link trips to routes for line names
-    df_trips_routes = df_trips[['route_id', 'trip_id']].merge(
-        df_routes[['route_id', 'route_short_name', 'route_long_name']], on='route_id', how='left'
-    )
-    df_trips_routes['line_name_clean'] = df_trips_routes['route_short_name'].fillna(df_trips_routes['route_long_name']).astype(str)
-    df_trips_routes = df_trips_routes[['trip_id', 'line_name_clean']]
+    # Fingerprint routes and find the ones that need recomputing
+    route_fingerprints = build_route_fingerprints(df_trips, df_routes, df_stop_times)
+    if gtfs_state:
+        changed_routes = diff_route_fingerprints(gtfs_state['route_fingerprints'], route_fingerprints)
+        previous_partials = gtfs_state['route_partials']
+        kept_partials = previous_partials[
+            previous_partials['route_id'].isin(route_fingerprints.index)
+            & ~previous_partials['route_id'].isin(changed_routes)
+        ]
+    else:
+        changed_routes = route_fingerprints.index
+        kept_partials = None
 
-    # Calculate passages per stop per hour
-    df_stop_times['arrival_time_sec'] = df_stop_times['arrival_time'].apply(time_to_seconds)
-    df_stop_times.dropna(subset=['arrival_time_sec'], inplace=True)
-    df_stop_times['hour'] = (df_stop_times['arrival_time_sec'] // 3600).astype(int) % 24
-    
-    df_frequency_raw = df_stop_times.merge(df_trips_routes, on='trip_id', how='left')
-    df_frequency_raw.dropna(subset=['line_name_clean'], inplace=True)
-    df_frequency = df_frequency_raw.groupby(['stop_id', 'line_name_clean', 'hour']).size().reset_index(name='passages_count')
+    # Hourly passages per stop, only for changed routes, then re-merged with the kept ones
+    df_trips_changed = df_trips[df_trips['route_id'].isin(changed_routes)]
+    df_stop_times_changed = df_stop_times[df_stop_times['trip_id'].isin(df_trips_changed['trip_id'])].copy()
+    df_route_partials = compute_route_partials(df_stop_times_changed, df_trips_changed, df_routes)
+    if kept_partials is not None:
+        df_route_partials = pd.concat([kept_partials, df_route_partials], ignore_index=True)
+
+    # Routes sharing a line name are summed, as if grouped by line directly
+    df_frequency = df_route_partials.groupby(['stop_id', 'line_name_clean', 'hour'])['passages_count'].sum().reset_index()
 
     # Normalize stop names and merge frequency
     df_stops_clean = df_stops[['stop_id', 'stop_name', 'stop_lat', 'stop_lon']].copy()
@@ -170,4 +192,79 @@ def process_gtfs(gtfs_data_raw):
         station_name_gtfs=('station_name', 'first') # Keep one original name
     ).reset_index()
 
-    return df_gtfs_processed
\ No newline at end of file
+    new_gtfs_state = {
+        "version": GTFS_STATE_VERSION,
+        "route_fingerprints": route_fingerprints,
+        "route_partials": df_route_partials,
+    }
+    return df_gtfs_processed, new_gtfs_state
+
+def compute_route_partials(df_stop_times, df_trips, df_routes):
+    """Counts passages per route, stop and hour (the partial aggregates reused between builds)."""
+    # Link trips to routes for line names
+    df_trips_routes = df_trips[['route_id', 'trip_id']].merge(
+        df_routes[['route_id', 'route_short_name', 'route_long_name']], on='route_id', how='left'
+    )
+    df_trips_routes['line_name_clean'] = df_trips_routes['route_short_name'].fillna(df_trips_routes['route_long_name']).astype(str)
+    df_trips_routes = df_trips_routes[['route_id', 'trip_id', 'line_name_clean']]
+
+    # Calculate passages per stop per hour
+    df_stop_times['arrival_time_sec'] = df_stop_times['arrival_time'].apply(time_to_seconds)
+    df_stop_times.dropna(subset=['arrival_time_sec'], inplace=True)
+    df_stop_times['hour'] = (df_stop_times['arrival_time_sec'] // 3600).astype(int) % 24
+    
+    df_frequency_raw = df_stop_times.merge(df_trips_routes, on='trip_id', how='left')
+    df_frequency_raw.dropna(subset=['line_name_clean'], inplace=True)
+    return df_frequency_raw.groupby(['route_id', 'stop_id', 'line_name_clean', 'hour']).size().reset_index(name='passages_count')
+
+def build_route_fingerprints(df_trips, df_routes, df_stop_times):
+    """
+    Hashes each route's `routes` row together with its `trips` rows and the
+    `stop_times` rows of those trips, so any edit to a route's schedule changes it.
+    """
+    route_hashes = pd.util.hash_pandas_object(df_routes, index=False).groupby(df_routes['route_id'].values).agg(
+        lambda h: hash(tuple(sorted(h)))
+    )
+    trip_hashes = pd.util.hash_pandas_object(df_trips, index=False).groupby(df_trips['route_id'].values).agg(
+        lambda h: hash(tuple(sorted(h)))
+    )
+
+    # Order-independent sum of stop_times row hashes per route, split in 32-bit halves to avoid overflow
+    stop_time_hashes = pd.util.hash_pandas_object(df_stop_times, index=False).to_numpy()
+    df_stop_time_hashes = pd.DataFrame({
+        'trip_id': df_stop_times['trip_id'].to_numpy(),
+        'low': (stop_time_hashes & 0xFFFFFFFF).astype(np.int64),
+        'high': (stop_time_hashes >> 32).astype(np.int64),
+    }).merge(df_trips[['trip_id', 'route_id']], on='trip_id')
+    stop_time_sums = df_stop_time_hashes.groupby('route_id')[['low', 'high']].sum()
+    stop_time_hashes = {
+        route_id: hash((low, high)) for route_id, low, high in stop_time_sums.itertuples(name=None)
+    }
+
+    route_ids = route_hashes.index.union(trip_hashes.index)
+    return pd.Series(
+        [
+            hash((route_hashes.get(route_id, 0), trip_hashes.get(route_id, 0), stop_time_hashes.get(route_id, 0)))
+            for route_id in route_ids
+        ],
+        index=route_ids, name='fingerprint'
+    )
+
+def is_valid_gtfs_state(gtfs_state):
+    """Checks a stored GTFS state has the current version and expected shape."""
+    return (
+        isinstance(gtfs_state, dict)
+        and GTFS_STATE_KEYS <= gtfs_state.keys()
+        and gtfs_state['version'] == GTFS_STATE_VERSION
+        and isinstance(gtfs_state['route_fingerprints'], pd.Series)
+        and isinstance(gtfs_state['route_partials'], pd.DataFrame)
+        and {'route_id', 'stop_id', 'line_name_clean', 'hour', 'passages_count'} <= set(gtfs_state['route_partials'].columns)
+    )
+
+def diff_route_fingerprints(old_fingerprints, new_fingerprints):
+    """Returns the route ids that are new or whose fingerprint changed."""
+    old_lookup = old_fingerprints.to_dict()
+    return pd.Index([
+        route_id for route_id, fingerprint in new_fingerprints.items()
+        if old_lookup.get(route_id) != fingerprint
+    ])
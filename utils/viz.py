@@ -3,6 +3,13 @@ import pandas as pd
 import altair as alt
 import streamlit as st
 import pydeck as pdk
+from utils.geo import query_viewport, radius_bounds, zoom_for_radius
+
+# Focused map: the search radius plus a margin fits the default 500 px chart height,
+# and stations are kept up to 8x the radius so wide screens and small pans stay covered
+# (pydeck doesn't report the live view back, so the crop can't follow zooming out)
+MAP_FOCUS_MARGIN = 1.5
+MAP_CROP_PADDING = 8
 
 # Thème Altair personnalisé pour la cohérence
 ALTAIR_THEME = {
@@ -16,13 +23,24 @@ ALTAIR_THEME = {
 alt.themes.register('custom_theme', lambda: ALTAIR_THEME)
 alt.themes.enable('custom_theme')
 
-def create_map_chart(df_geo: pd.DataFrame):
+def create_map_chart(df_geo: pd.DataFrame, station_index=None, focus=None):
     """
     Creates an interactive map using Pydeck (st.pydeck_chart) with tooltips.
+    If a `focus` (lat, lon, radius_m) and the `station_index` are given, the map is zoomed
+    on that search area and only the stations around it are sent to the browser.
     """
     
-    # 1. Prepare DataFrame (ensure numeric, drop NaNs)
-    df_map = df_geo.copy()
+    # 1. Prepare DataFrame (ensure numeric, drop NaNs), cropped around the location when focused
+    if focus is not None and station_index is not None:
+        latitude, longitude, radius_m = focus
+        zoom = zoom_for_radius(latitude, radius_m * MAP_FOCUS_MARGIN)
+        visible_labels = query_viewport(station_index, *radius_bounds(latitude, longitude, radius_m * MAP_CROP_PADDING))
+        # df_geo may be filtered by line, so keep only the labels it still has
+        df_map = df_geo.loc[df_geo.index.intersection(visible_labels)].copy()
+        st.caption("Showing stations near the selected location only. Untick 'Search near a location' to see the whole network.")
+    else:
+        latitude, longitude, zoom = 48.8566, 2.3522, 11
+        df_map = df_geo.copy()
     for col in ['lat', 'lon', 'pollution_score', 'avg_passages', 'station_name', 'line_name_list']:
         if col in ['lat', 'lon', 'pollution_score', 'avg_passages']:
             df_map[col] = pd.to_numeric(df_map[col], errors='coerce')
@@ -42,7 +60,9 @@ def create_map_chart(df_geo: pd.DataFrame):
     df_map['color'] = df_map['pollution_score'].apply(map_score_to_rgba)
 
     # 3. Scale size (Pydeck uses radius in meters, needs careful scaling)
-    min_freq, max_freq = df_map['avg_passages'].min(), df_map['avg_passages'].max()
+    # Use the uncropped table so a given frequency keeps the same size wherever the map is focused
+    freq_all = pd.to_numeric(df_geo['avg_passages'], errors='coerce')
+    min_freq, max_freq = freq_all.min(), freq_all.max()
     if max_freq > min_freq:
         # Scale radius roughly from 20m to 200m based on frequency
         df_map['radius'] = ((df_map['avg_passages'] - min_freq) / (max_freq - min_freq)) * 250 + 50
@@ -63,7 +83,7 @@ def create_map_chart(df_geo: pd.DataFrame):
 
     # 5. Set Initial View State
     view_state = pdk.ViewState(
-        latitude=48.8566, longitude=2.3522, zoom=11, pitch=0,
+        latitude=latitude, longitude=longitude, zoom=zoom, pitch=0,
     )
 
     # 6. Define Tooltip Content (HTML)